@@ -1,9 +1,16 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 import plotly.express as px
 import plotly.graph_objects as go
+from numba import njit
+from tsdownsample import LTTBDownsampler
 from pathlib import Path
+import logging
+import tempfile
+
+from features import build_enriched
 
 # ===============================
 # PAGE CONFIG
@@ -19,48 +26,171 @@ st.caption("Polysilicon → Wafer → Die → Margin | Macro & Policy Intelligen
 # ===============================
 # SAFE DATA LOADER (FIXES FILE ERROR)
 # ===============================
+logger = logging.getLogger(__name__)
+
 BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / "data"
 
+def read_table(csv_name, columns=None):
+    # convert each CSV to Parquet on first use; later cold starts skip text parsing
+    csv_path = DATA_DIR / csv_name
+    parquet_path = csv_path.with_suffix(".parquet")
+    # a Parquet file without its CSV was converted at build time: keep it
+    stale = not parquet_path.exists() or (
+        csv_path.exists()
+        and parquet_path.stat().st_mtime < csv_path.stat().st_mtime
+    )
+    if stale:
+        tmp_path = None
+        try:
+            # unique temp name so concurrent cold starts never share a file
+            with tempfile.NamedTemporaryFile(
+                dir=DATA_DIR, suffix=".parquet.tmp", delete=False
+            ) as tmp:
+                tmp_path = Path(tmp.name)
+            pd.read_csv(csv_path).to_parquet(tmp_path, compression="zstd")
+            tmp_path.replace(parquet_path)
+        except (OSError, pa.lib.ArrowException) as exc:
+            # read-only dir or a column pyarrow cannot type: plain CSV still works
+            logger.warning("Parquet cache for %s not written: %s", csv_name, exc)
+            return pd.read_csv(csv_path, usecols=columns)
+        finally:
+            # no-op after a successful replace; otherwise drop the partial file
+            if tmp_path is not None:
+                tmp_path.unlink(missing_ok=True)
+    return pd.read_parquet(parquet_path, engine="pyarrow", columns=columns)
+
 @st.cache_data
 def load_data():
-    return pd.read_csv(DATA_DIR / "polysilicon_daily_synthetic_2016_2025.csv")
+    return read_table(
+        "polysilicon_daily_synthetic_2016_2025.csv",
+        columns=["date", "price_usd_per_kg"]
+    )
 
 @st.cache_data
 def load_forecast():
-    return pd.read_csv(DATA_DIR / "wafer_material_cost_forecast_2026.csv")
-
-df = load_data()
-forecast = load_forecast()
-
-df["date"] = pd.to_datetime(df["date"])
-df = df.sort_values("date")
-
-# ===============================
-# SYNTHETIC MACRO + FINANCIAL DATA
-# ===============================
-np.random.seed(42)
+    return read_table("wafer_material_cost_forecast_2026.csv")
+
+MAX_LAG = 365
+
+@njit(cache=True, fastmath=True)
+def lag_corr_all(X, Y, max_lag):
+    n = len(X)
+    out = np.empty(max_lag + 1)
+    for k in range(max_lag + 1):
+        m = n - k
+        s1 = 0.0
+        s2 = 0.0
+        ss1 = 0.0
+        ss2 = 0.0
+        s12 = 0.0
+        for i in range(m):
+            a = X[i + k]
+            b = Y[i]
+            s1 += a
+            s2 += b
+            ss1 += a * a
+            ss2 += b * b
+            s12 += a * b
+        v1 = ss1 - s1 * s1 / m
+        v2 = ss2 - s2 * s2 / m
+        out[k] = (s12 - s1 * s2 / m) / np.sqrt(v1 * v2)
+    return out
+
+def monthly_ohlc(dates, values):
+    # dates must be sorted; each month is a contiguous segment
+    months = dates.astype("datetime64[M]")
+    _, starts = np.unique(months, return_index=True)
+    ends = np.append(starts[1:], len(values)) - 1
+    # label each candle with its month-end date, as resample("M") did
+    x = (months[starts] + 1).astype("datetime64[D]") - 1
+    return (
+        x,
+        values[starts],
+        np.maximum.reduceat(values, starts),
+        np.minimum.reduceat(values, starts),
+        values[ends]
+    )
 
-df["DXY"] = 100 - 0.25 * df["price_usd_per_kg"] + np.random.normal(0, 0.6, len(df))
-df["Copper"] = 6000 + 120 * df["price_usd_per_kg"] + np.random.normal(0, 80, len(df))
-df["Gold"] = 1400 + 4.5 * df["price_usd_per_kg"] + np.random.normal(0, 15, len(df))
-df["Silver"] = 18 + 0.09 * df["price_usd_per_kg"] + np.random.normal(0, 0.6, len(df))
+# total points per chart; a ~1200px chart gains nothing from more
+LINE_POINTS = 1500
+
+def lttb(data, n_out=LINE_POINTS):
+    # split the chart budget across the series and keep every point LTTB
+    # selects for any of them, so the result has at most n_out rows
+    if len(data) <= n_out:
+        return data
+    x = data.index.to_numpy().astype(np.int64)
+    series = [data] if isinstance(data, pd.Series) else [data[c] for c in data]
+    per_series = max(n_out // len(series), 3)
+    keep = np.unique(np.concatenate([
+        LTTBDownsampler().downsample(x, s.to_numpy(), n_out=per_series)
+        for s in series
+    ]))
+    return data.iloc[keep]
+
+@st.cache_resource
+def load_enriched():
+    # built once per process; cache_resource hands every rerun the same
+    # read-only frames instead of unpickling fresh copies. Callers must
+    # not mutate them.
+    return build_enriched(load_data())
+
+@st.cache_resource
+def ratio_ohlc():
+    # Polysilicon / Copper ratio candles, built once from the shared frame;
+    # the multiply allocates the only buffer and the divide runs in place
+    df, _, _ = load_enriched()
+    ratio = np.multiply(df["price_usd_per_kg"].to_numpy(dtype=np.float32), 1000.0)
+    np.divide(ratio, df["Copper"].to_numpy(dtype=np.float32), out=ratio)
+    return monthly_ohlc(df["date"].to_numpy(), ratio)
+
+CORR_COLS = [
+    "price_usd_per_kg",
+    "DXY",
+    "Copper",
+    "Gold",
+    "Silver",
+    "VIX",
+    "Industrial_Demand",
+    "GDP_Growth"
+]
+
+@st.cache_resource
+def corr_matrix():
+    # one variable per row, contiguous for np.corrcoef
+    df, _, _ = load_enriched()
+    A = np.ascontiguousarray(df[CORR_COLS].to_numpy(dtype=np.float32).T)
+    return np.corrcoef(A)
+
+@st.cache_resource
+def lag_corr_table():
+    # corr(price, Copper.shift(k)) for every slider lag k, computed once
+    df, _, _ = load_enriched()
+    return lag_corr_all(
+        df["price_usd_per_kg"].to_numpy(dtype=np.float64),
+        df["Copper"].to_numpy(dtype=np.float64),
+        MAX_LAG
+    )
 
-# VIX (risk index)
-df["VIX"] = 18 + 0.4 * df["price_usd_per_kg"] + np.random.normal(0, 2, len(df))
+MACRO_COLS = ["VIX", "Industrial_Demand", "GDP_Growth"]
 
-# Industrial demand index (semiconductor + manufacturing proxy)
-df["Industrial_Demand"] = 100 + 0.03 * df["Copper"] + np.random.normal(0, 5, len(df))
+@st.cache_resource
+def line_series():
+    # downsampled price trend and macro cycle lines, built once
+    _, df_indexed, _ = load_enriched()
+    return lttb(df_indexed["price_usd_per_kg"]), lttb(df_indexed[MACRO_COLS])
 
-# GDP Growth (macro cycle proxy)
-df["GDP_Growth"] = 2.5 + 0.002 * df["Industrial_Demand"] - 0.05 * df["VIX"]
+_, _, mean_price = load_enriched()
+price_line, macro_lines = line_series()
+forecast = load_forecast()
 
 # ===============================
 # SIDEBAR CONTROLS
 # ===============================
 st.sidebar.header("Controls")
 
-lag = st.sidebar.slider("Supply Chain Lag (days)", 0, 365, 180)
+lag = st.sidebar.slider("Supply Chain Lag (days)", 0, MAX_LAG, 180)
 shock = st.sidebar.slider("Polysilicon Price Shock (%)", -30, 50, 10)
 
 node_map = {"65 nm": 700, "28 nm": 900, "14 nm": 1200, "7 nm": 1600}
@@ -84,7 +214,7 @@ tabs = st.tabs([
 # ===============================
 with tabs[0]:
     st.subheader("Polysilicon Price Trend")
-    st.line_chart(df.set_index("date")["price_usd_per_kg"])
+    st.line_chart(price_line)
 
 # ===============================
 # TAB 2 – RATIO CANDLESTICK
@@ -92,19 +222,16 @@ with tabs[0]:
 with tabs[1]:
     st.subheader("Polysilicon / Copper Ratio")
 
-    df["ratio"] = df["price_usd_per_kg"] / (df["Copper"] / 1000)
-    ohlc = df.resample("M", on="date").agg({
-        "ratio": ["first", "max", "min", "last"]
-    })
-    ohlc.columns = ["open", "high", "low", "close"]
+    month_end, open_, high, low, close = ratio_ohlc()
 
     fig = go.Figure(data=[go.Candlestick(
-        x=ohlc.index,
-        open=ohlc["open"],
-        high=ohlc["high"],
-        low=ohlc["low"],
-        close=ohlc["close"]
+        x=month_end,
+        open=open_,
+        high=high,
+        low=low,
+        close=close
     )])
+    fig.update_layout(transition_duration=0)
 
     st.plotly_chart(fig, use_container_width=True)
 
@@ -114,25 +241,15 @@ with tabs[1]:
 with tabs[2]:
     st.subheader("Correlation: Macro & Metals")
 
-    corr_cols = [
-        "price_usd_per_kg",
-        "DXY",
-        "Copper",
-        "Gold",
-        "Silver",
-        "VIX",
-        "Industrial_Demand",
-        "GDP_Growth"
-    ]
-
-    corr = df[corr_cols].corr()
-
     fig = px.imshow(
-        corr,
+        corr_matrix(),
+        x=CORR_COLS,
+        y=CORR_COLS,
         text_auto=True,
         color_continuous_scale="RdBu_r",
         title="Correlation Matrix"
     )
+    fig.update_layout(transition_duration=0)
 
     st.plotly_chart(fig, use_container_width=True)
 
@@ -142,7 +259,7 @@ with tabs[2]:
 with tabs[3]:
     st.subheader("Lagged Correlation (Polysilicon vs Copper)")
 
-    lag_corr = df["price_usd_per_kg"].corr(df["Copper"].shift(lag))
+    lag_corr = lag_corr_table()[lag]
     st.metric("Correlation Coefficient", round(lag_corr, 3))
 
 # ===============================
@@ -151,13 +268,7 @@ with tabs[3]:
 with tabs[4]:
     st.subheader("Macro Cycle Indicators")
 
-    st.line_chart(
-        df.set_index("date")[[
-            "VIX",
-            "Industrial_Demand",
-            "GDP_Growth"
-        ]]
-    )
+    st.line_chart(macro_lines)
 
 # ===============================
 # TAB 6 – SHOCK → DIE COST → MARGIN
@@ -165,13 +276,14 @@ with tabs[4]:
 with tabs[5]:
     st.subheader("Price Shock → Die Cost & Margin")
 
-    shocked_price = df["price_usd_per_kg"] * (1 + shock / 100)
-    wafer_cost = shocked_price * 0.60 / 0.68
-    die_cost = wafer_cost / dies_per_wafer
+    # All steps are affine, so the mean die cost / margin follow
+    # directly from the mean polysilicon price.
+    shocked_mean = mean_price * (1 + shock / 100)
+    die_cost_mean = shocked_mean * 0.60 / 0.68 / dies_per_wafer
 
     ASP = 12.0
-    margin = (ASP - die_cost) / ASP * 100
+    margin_mean = (ASP - die_cost_mean) / ASP * 100
 
     col1, col2 = st.columns(2)
-    col1.metric("Avg Die Cost (USD)", round(die_cost.mean(), 4))
-    col2.metric("Gross Margin (%)", round(margin.mean(), 2))
+    col1.metric("Avg Die Cost (USD)", round(die_cost_mean, 4))
+    col2.metric("Gross Margin (%)", round(margin_mean, 2))